@@ -0,0 +1,190 @@
+// Copyright 2022 Google LLC
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "paranoid_crypto/lib/cc_util/low_hamming_weight.h"
+
+#include <gmpxx.h>
+
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+namespace paranoid_crypto::lib::cc_util {
+
+namespace {
+
+// Returns the bit length of a non-negative integer. Unlike mpz_sizeinbase the
+// bit length of 0 is 0.
+int64_t BitLength(const mpz_class& x) {
+  if (sgn(x) == 0) {
+    return 0;
+  }
+  return mpz_sizeinbase(x.get_mpz_t(), 2);
+}
+
+// A partial factorization.
+struct Entry {
+  // A guess for the msbs of p, i.e., the value p >> bit.
+  mpz_class p;
+  // A guess for the msbs of q, i.e., the value q >> bit.
+  mpz_class q;
+  // The sum of the Hamming weights of p and q.
+  int64_t hw;
+  // The number of missing bits in p and q.
+  int64_t bit;
+};
+
+// A bucket queue of partial factorizations.
+//
+// Entries are prioritized by the heuristic v = rem_size + 5 * hw. Since v is a
+// small non-negative integer, entries are stored in buckets indexed by v.
+// Entries with the same v are popped last-in-first-out. This is the same
+// order as in the Python implementation.
+class BucketQueue {
+ public:
+  explicit BucketQueue(int64_t max_value)
+      : buckets_(max_value + 1), min_bucket_(max_value + 1), size_(0) {}
+
+  bool Empty() const { return size_ == 0; }
+
+  void Push(const mpz_class& p, const mpz_class& q, int64_t hw, int64_t bit,
+            int64_t rem_size) {
+    size_t h;
+    if (free_handles_.empty()) {
+      h = entries_.size();
+      entries_.push_back(Entry{p, q, hw, bit});
+    } else {
+      h = free_handles_.back();
+      free_handles_.pop_back();
+      Entry& entry = entries_[h];
+      entry.p = p;
+      entry.q = q;
+      entry.hw = hw;
+      entry.bit = bit;
+    }
+    size_t v = rem_size + 5 * hw;
+    buckets_[v].push_back(h);
+    size_++;
+    if (v < min_bucket_) {
+      min_bucket_ = v;
+    }
+  }
+
+  // Removes an entry with minimal heuristic. The entry is swapped into *entry
+  // and the heuristic is returned.
+  int64_t Pop(Entry* entry) {
+    while (buckets_[min_bucket_].empty()) {
+      min_bucket_++;
+    }
+    size_t h = buckets_[min_bucket_].back();
+    buckets_[min_bucket_].pop_back();
+    size_--;
+    Entry& e = entries_[h];
+    entry->p.swap(e.p);
+    entry->q.swap(e.q);
+    entry->hw = e.hw;
+    entry->bit = e.bit;
+    free_handles_.push_back(h);
+    return min_bucket_;
+  }
+
+ private:
+  std::vector<Entry> entries_;
+  std::vector<size_t> free_handles_;
+  std::vector<std::vector<size_t>> buckets_;
+  size_t min_bucket_;
+  size_t size_;
+};
+
+}  // namespace
+
+LowHammingWeightResult LowHammingWeight(const mpz_class& n, int64_t cutoff,
+                                        int64_t maxsteps) {
+  const int64_t bits = BitLength(n);
+  const int64_t psize = (bits + 1) / 2;
+  if (sgn(n) <= 0 || psize < 1) {
+    return {false, 0, 0};
+  }
+  // See CheckLowHammingWeightNative for a description of the thresholds.
+  const int64_t threshold_cutoff = bits;
+  const int64_t threshold_weak = bits - 12;
+
+  // The heuristic is at most 6 * bits + 6.
+  BucketQueue queue(6 * bits + 7);
+  mpz_class remainder = n - (mpz_class(1) << (2 * (psize - 1)));
+  queue.Push(1, 1, 2, psize - 1, BitLength(remainder));
+  // smallest value for the heuristic
+  int64_t minv = BitLength(remainder) + 5 * 2;
+
+  Entry entry;
+  mpz_class rem, rem0, p0, q0, sum;
+  int64_t steps = 0;
+  while (steps < maxsteps && !queue.Empty()) {
+    steps++;
+    if (steps == cutoff && minv >= threshold_cutoff) {
+      break;
+    }
+    int64_t v = queue.Pop(&entry);
+    if (v < minv) {
+      minv = v;
+    }
+    mpz_class& p = entry.p;
+    mpz_class& q = entry.q;
+    int64_t bit = entry.bit;
+    // The loop invariant is rem == (n >> (2 * bit)) - p * q.
+    rem = n >> (2 * bit);
+    rem -= p * q;
+    while (bit >= 1) {
+      p <<= 1;
+      q <<= 1;
+      bit--;
+      rem <<= 2;
+      rem += 2 * mpz_tstbit(n.get_mpz_t(), 2 * bit + 1) +
+             mpz_tstbit(n.get_mpz_t(), 2 * bit);
+      // Tries p0 * q0 = pq + p, pq + q, pq + p + q + 1.
+      bool negative = false;
+      for (int i = 0; i < 3; i++) {
+        int dp = i == 0 ? 0 : 1;
+        int dq = i == 1 ? 0 : 1;
+        // rem0 = (n >> (2 * bit)) - p0 * q0
+        rem0 = rem;
+        if (dq) rem0 -= p;
+        if (dp) rem0 -= q;
+        if (dp && dq) rem0 -= 1;
+        if (sgn(rem0) < 0) {
+          negative = true;
+          break;
+        }
+        p0 = p + dp;
+        q0 = q + dq;
+        if (bit) {
+          sum = p0 + q0;
+          // The algorithm looks for a factorization where p <= q.
+          if (rem0 <= sum && p0 <= q0) {
+            queue.Push(p0, q0, entry.hw + dp + dq, bit,
+                       BitLength(rem0) + 2 * bit);
+          }
+        } else if (sgn(rem0) == 0) {
+          return {true, p0, q0};
+        }
+      }
+      if (!negative && sgn(rem0) > 0) {
+        break;
+      }
+    }
+  }
+  return {minv <= threshold_weak, 0, 0};
+}
+
+}  // namespace paranoid_crypto::lib::cc_util
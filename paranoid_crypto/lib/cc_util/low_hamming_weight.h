@@ -0,0 +1,42 @@
+// Copyright 2022 Google LLC
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PARANOID_CRYPTO_LIB_CC_UTIL_LOW_HAMMING_WEIGHT_H_
+#define PARANOID_CRYPTO_LIB_CC_UTIL_LOW_HAMMING_WEIGHT_H_
+#include <gmpxx.h>
+
+#include <cstdint>
+
+namespace paranoid_crypto::lib::cc_util {
+
+// The result of LowHammingWeight.
+struct LowHammingWeightResult {
+  // True if the modulus is (probably) weak.
+  bool weak;
+  // The factors p <= q of the modulus if a factorization was found.
+  // Both factors are 0 if no factorization was found.
+  mpz_class p;
+  mpz_class q;
+};
+
+// Tries to factor n assuming that the factors have a low Hamming weight.
+// This is the C++ implementation of rsa_util.CheckLowHammingWeight. See the
+// Python implementation CheckLowHammingWeightNative for a description of the
+// search and its parameters. Both implementations return the same results.
+LowHammingWeightResult LowHammingWeight(const mpz_class& n, int64_t cutoff,
+                                        int64_t maxsteps);
+
+}  // namespace paranoid_crypto::lib::cc_util
+
+#endif  // PARANOID_CRYPTO_LIB_CC_UTIL_LOW_HAMMING_WEIGHT_H_
@@ -0,0 +1,70 @@
+// Copyright 2022 Google LLC
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "paranoid_crypto/lib/cc_util/low_hamming_weight.h"
+
+#include <gmpxx.h>
+
+#include "testing/base/public/benchmark.h"
+#include "testing/base/public/googletest.h"
+#include "testing/base/public/gunit.h"
+
+namespace paranoid_crypto::lib::cc_util {
+namespace {
+
+mpz_class Pow2(int k) { return mpz_class(1) << k; }
+
+TEST(LowHammingWeight, Factor) {
+  mpz_class p = Pow2(127) + Pow2(64) + 1;
+  mpz_class q = Pow2(127) + Pow2(100) + Pow2(2) + 1;
+  LowHammingWeightResult res = LowHammingWeight(p * q, 2500, 10000);
+  EXPECT_TRUE(res.weak);
+  EXPECT_EQ(res.p, p);
+  EXPECT_EQ(res.q, q);
+}
+
+TEST(LowHammingWeight, Random) {
+  // A random odd integer is very unlikely to be a product of two factors with
+  // a low Hamming weight.
+  gmp_randclass rand(gmp_randinit_default);
+  rand.seed(1);
+  mpz_class n = rand.get_z_bits(2048) | Pow2(2047) | 1;
+  LowHammingWeightResult res = LowHammingWeight(n, 2500, 10000);
+  EXPECT_FALSE(res.weak);
+  EXPECT_EQ(res.p, 0);
+  EXPECT_EQ(res.q, 0);
+}
+
+TEST(LowHammingWeight, EdgeCases) {
+  for (int n = 0; n < 100; n++) {
+    LowHammingWeightResult res = LowHammingWeight(n, 2500, 10000);
+    if (res.p != 0) {
+      EXPECT_EQ(res.p * res.q, n) << n;
+    }
+  }
+}
+
+}  // namespace
+}  // namespace paranoid_crypto::lib::cc_util
+
+void BM_LOW_HAMMING_WEIGHT(benchmark::State& state) {
+  gmp_randclass rand(gmp_randinit_default);
+  rand.seed(1);
+  mpz_class n = rand.get_z_bits(state.range(0)) | 1;
+  for (auto s : state) {
+    paranoid_crypto::lib::cc_util::LowHammingWeight(n, 2500, 10000);
+  }
+}
+
+BENCHMARK(BM_LOW_HAMMING_WEIGHT)->Range(512, 4096);
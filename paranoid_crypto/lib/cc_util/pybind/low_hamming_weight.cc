@@ -0,0 +1,68 @@
+// Copyright 2022 Google LLC
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "paranoid_crypto/lib/cc_util/low_hamming_weight.h"
+
+#include <gmpxx.h>
+
+#include <cstdint>
+#include <string>
+#include <tuple>
+
+#include "pybind11/pybind11.h"
+
+namespace paranoid_crypto::lib::cc_util::pybind {
+
+namespace py = pybind11;
+
+namespace {
+
+// Converts a big-endian byte string into an integer.
+mpz_class FromBytes(const std::string& bytes) {
+  mpz_class res;
+  mpz_import(res.get_mpz_t(), bytes.size(), 1, 1, 1, 0, bytes.data());
+  return res;
+}
+
+// Converts a non-negative integer into a big-endian byte string.
+py::bytes ToBytes(const mpz_class& x) {
+  std::string bytes((mpz_sizeinbase(x.get_mpz_t(), 2) + 7) / 8, '\0');
+  size_t size = 0;
+  mpz_export(bytes.data(), &size, 1, 1, 1, 0, x.get_mpz_t());
+  bytes.resize(size);
+  return py::bytes(bytes);
+}
+
+// Wrapper for LowHammingWeight, where integers are big-endian byte strings.
+// Returns a tuple (weak, p, q). p and q are empty if n was not factored.
+// The GIL is released during the search, so that several moduli can be
+// checked concurrently from Python threads.
+std::tuple<bool, py::bytes, py::bytes> LowHammingWeightBytes(
+    py::bytes n, int64_t cutoff, int64_t maxsteps) {
+  mpz_class n_int = FromBytes(n);
+  LowHammingWeightResult res;
+  {
+    py::gil_scoped_release release;
+    res = LowHammingWeight(n_int, cutoff, maxsteps);
+  }
+  return {res.weak, ToBytes(res.p), ToBytes(res.q)};
+}
+
+}  // namespace
+
+PYBIND11_MODULE(low_hamming_weight, m) {
+  m.def("LowHammingWeight", LowHammingWeightBytes);
+}
+
+}  // namespace paranoid_crypto::lib::cc_util::pybind
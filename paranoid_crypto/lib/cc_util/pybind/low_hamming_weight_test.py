@@ -0,0 +1,72 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for paranoid_crypto.lib.cc_util.pybind.low_hamming_weight."""
+
+from concurrent import futures
+from absl.testing import absltest
+from paranoid_crypto.lib.cc_util.pybind import low_hamming_weight
+
+
+class LowHammingWeightTest(absltest.TestCase):
+  """Tests the pybind binding.
+
+  The tests for the C++ implementation are in
+    paranoid_crypto/lib/cc_util/low_hamming_weight_test.cc
+  The tests comparing the C++ version with the native python version are in
+    paranoid_crypto/lib/rsa_util_test.py
+  """
+
+  def testFactor(self):
+    # The factors do not have to be primes.
+    p = 2**127 + 2**64 + 1
+    q = 2**127 + 2**100 + 2**2 + 1
+    n = (p * q).to_bytes(32, "big")
+    self.assertEqual(
+        low_hamming_weight.LowHammingWeight(n, 2500, 10**4),
+        (True, p.to_bytes(16, "big"), q.to_bytes(16, "big")),
+    )
+
+  def testNoFactor(self):
+    self.assertEqual(
+        low_hamming_weight.LowHammingWeight(bytes(), 2500, 10**4),
+        (False, b"", b""),
+    )
+
+  def testThreads(self):
+    # The search releases the GIL, hence it can run in several threads.
+    p = 2**127 + 2**64 + 1
+    qs = [2**127 + 2**i + 1 for i in range(70, 110, 5)]
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+      results = executor.map(
+          lambda q: low_hamming_weight.LowHammingWeight(
+              (p * q).to_bytes(32, "big"), 2500, 10**4
+          ),
+          qs,
+      )
+      for q, res in zip(qs, results):
+        self.assertEqual(
+            res, (True, p.to_bytes(16, "big"), q.to_bytes(16, "big"))
+        )
+
+  def testWrongType(self):
+    with self.assertRaises(TypeError):
+      low_hamming_weight.LowHammingWeight(12345, 2500, 10**4)
+    with self.assertRaises(TypeError):
+      low_hamming_weight.LowHammingWeight(None, 2500, 10**4)
+    with self.assertRaises(TypeError):
+      low_hamming_weight.LowHammingWeight(bytes(8), 2**64, 10**4)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -58,6 +58,39 @@ def ExtendedProductTree(values: list[int]) -> tuple[list[list[int]], int]:
   return prod_tree, t[0]
 
 
+def RemainderTree(x: int, values: list[int]) -> list[int]:
+  """Returns the remainders of x modulo each value.
+
+  The remainders are computed by reducing x modulo the nodes of a product
+  tree of the values, from the root to the leaves. If x is much larger than
+  the values then this is faster than reducing x modulo each value separately.
+
+  Args:
+    x: the value to reduce
+    values: List of positive moduli.
+
+  Returns:
+    the list [x % v for v in values]
+
+  Raises:
+    ValueError: if some value is not positive.
+  """
+  if not values:
+    return []
+  if min(values) <= 0:
+    raise ValueError("RemainderTree requires positive moduli.")
+  prod_tree = [values]
+  while len(values) > 1:
+    pairwise = itertools.zip_longest(values[::2], values[1::2], fillvalue=1)
+    values = [a * b for a, b in pairwise]
+    prod_tree.append(values)
+  remainders = [x]
+  while prod_tree:
+    values = prod_tree.pop()
+    remainders = [remainders[i // 2] % v for i, v in enumerate(values)]
+  return remainders
+
+
 def Inverse2exp(n: int, k: int) -> Optional[int]:
   """Computes the inverse of n modulo 2**k.
 
@@ -149,7 +182,9 @@ def Sqrt2exp(n: int, k: int) -> list[int]:
   s = InverseSqrt2exp(n, k)
   if s is None:
     return []
-  r = Inverse2exp(s, k)
+  # Since s * s * n % 2**k == 1, it follows that n * s is the inverse of s
+  # and a square root of n. This saves a second Newton iteration.
+  r = gmpy.f_mod_2exp(n * s, k)
   # Besides r there are three other roots modulo 2**k.
   roots = [
       r,
@@ -20,6 +20,17 @@ from paranoid_crypto.lib import ntheory_util
 
 class NTheoryUtilTest(absltest.TestCase):
 
+  def testRemainderTree(self):
+    self.assertEmpty(ntheory_util.RemainderTree(12345, []))
+    self.assertEqual(ntheory_util.RemainderTree(12345, [100]), [45])
+    x = random.getrandbits(4096)
+    values = [random.getrandbits(256) + 1 for _ in range(13)]
+    self.assertEqual(
+        ntheory_util.RemainderTree(x, values), [x % v for v in values]
+    )
+    with self.assertRaises(ValueError):
+      ntheory_util.RemainderTree(x, [3, 0, 5])
+
   def testInverse2exp(self):
     for i in range(1, 257):
       x = random.getrandbits(i) | 1
@@ -434,10 +434,10 @@ class CheckPollardpm1(base_check.RSAKeyCheck):
 
   def Check(self, artifacts: list[paranoid_pb2.RSAKey]) -> bool:
     any_weak = False
-    for key in artifacts:
+    moduli = [gmpy.mpz(util.Bytes2Int(key.rsa_info.n)) for key in artifacts]
+    results = rsa_util.BatchPollardpm1(moduli, self._m)
+    for key, (weak, factors) in zip(artifacts, results):
       test_result = self._CreateTestResult()
-      n = gmpy.mpz(util.Bytes2Int(key.rsa_info.n))
-      weak, factors = rsa_util.Pollardpm1(n, self._m)
       if weak:
         if factors:
           logging.warning(
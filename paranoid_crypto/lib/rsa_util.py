@@ -13,12 +13,18 @@
 # limitations under the License.
 """Set of math functions that are useful when checking RSA."""
 
-import heapq
 from typing import Optional
 import gmpy2 as gmpy
 from paranoid_crypto.lib import lll
 from paranoid_crypto.lib import ntheory_util
 from paranoid_crypto.lib import special_case_factoring
+from paranoid_crypto.lib.cc_util.pybind import low_hamming_weight
+
+# Product of all primes smaller than 10**4. Used for a cheap trial division
+# with a single gcd.
+_SMALL_PRIMES_PRODUCT = ntheory_util.FastProduct(
+    list(map(gmpy.mpz, ntheory_util.Sieve(10**4)))
+)
 
 
 def BatchGCD(
@@ -59,6 +65,52 @@ def BatchGCD(
   return [gcds_dict[v] for v in values]
 
 
+class BatchGCDContext:
+  """Tests values against a growing corpus of values with BatchGCD.
+
+  BatchGCD only needs the product of the corpus to test new values against
+  it. This class keeps that product, so that adding values to the corpus only
+  requires a product tree of the added values and one multiplication, instead
+  of rebuilding the product tree of the whole corpus.
+  """
+
+  def __init__(self, values: Optional[list[int]] = None):
+    """BatchGCDContext constructor.
+
+    Args:
+      values: the initial values of the corpus.
+    """
+    self._prod = 1
+    if values:
+      self.Add(values)
+
+  @property
+  def product(self) -> int:
+    """The product of all values in the corpus."""
+    return self._prod
+
+  def Add(self, values: list[int]):
+    """Adds values to the corpus.
+
+    Args:
+      values: the values to add. Values already in the corpus should not be
+        added again, since otherwise they are reported as common factors.
+    """
+    self._prod *= ntheory_util.FastProduct(list(values))
+
+  def BatchGCD(self, values: list[int]) -> list[int]:
+    """Returns a list with the GCD for each value with all other values.
+
+    Args:
+      values: List of mpz numbers to calculate the pairwise GCDs.
+
+    Returns:
+      a list of GCDs. The i-th element of the result is the GCD of values[i]
+      with the product of all values[j] with i!=j and all values of the corpus.
+    """
+    return BatchGCD(values, self._prod)
+
+
 def FermatFactor(n: int, max_steps: int) -> Optional[tuple[int, int]]:
   """Returns p and q such as n = p*q.
 
@@ -83,8 +135,11 @@ def FermatFactor(n: int, max_steps: int) -> Optional[tuple[int, int]]:
   b2 = a * a - n
 
   for _ in range(max_steps):
+    # is_square rejects most non-squares using residues only, so the square
+    # root is computed just once when a square has been found.
     if gmpy.is_square(b2):
-      return a + gmpy.isqrt(b2), a - gmpy.isqrt(b2)
+      b = gmpy.isqrt(b2)
+      return a + b, a - b
 
     # or a += 1; b2 = a * a - n
     b2 += a
@@ -165,10 +220,12 @@ def FactorHighAndLowBitsEqual(
     return None
   # Computes a square root r0 modulo 2**k
   k = (n.bit_length() + 1) // 2
-  r0 = ntheory_util.Inverse2exp(ntheory_util.InverseSqrt2exp(n, k + 1), k + 1)
+  s0 = ntheory_util.InverseSqrt2exp(n, k + 1)
   # Fighting with broken lint rules here and below.
-  if r0 is None:
+  if s0 is None:
     raise ArithmeticError("expecting that square root exists")
+  # s0 is an inverse square root of n, hence n * s0 is a square root of n.
+  r0 = gmpy.f_mod_2exp(n * s0, k + 1)
 
   # approximation of (p+q)/2 if p is close to q.
   a = gmpy.isqrt(n - 1) + 1
@@ -185,9 +242,13 @@ def FactorHighAndLowBitsEqual(
         # but a few (middle_bits) bits of (p+q)/2 are either determined by
         # a or r respectively.
         m = min(middle_bits, i)
+        # d == s**2 - n is updated incrementally using
+        # (s + step)**2 == s**2 + 2 * s * step + step**2.
+        step = 2 ** (i - m)
+        d = s * s - n
         for _ in range(2**m):
-          s += 2 ** (i - m)
-          d = s**2 - n
+          d += (s << (i - m + 1)) + step * step
+          s += step
           if gmpy.is_square(d):
             d_sqrt = gmpy.isqrt(d)
             return [s - d_sqrt, s + d_sqrt]
@@ -281,10 +342,17 @@ def CheckContinuedFraction(n: int, bound: int) -> tuple[bool, list[int]]:
   """
   m = 2 ** n.bit_length()
   cf = ntheory_util.ContinuedFraction(n, m)
-  x = 2 ** (n.bit_length() // 2)
+  k = n.bit_length() // 2
+  x = 2**k
+  # Since x is a power of two, ntheory_util.DivmodRounded(., x) is computed
+  # with shifts and masks instead of divisions.
+  half = x // 2
+  mask = x - 1
   for quot, _, v in cf:
-    r, c = ntheory_util.DivmodRounded(n * v, x)
-    a, b = ntheory_util.DivmodRounded(r, x)
+    t = n * v + half
+    r, c = t >> k, (t & mask) - half
+    t = r + half
+    a, b = t >> k, (t & mask) - half
     if a and c and gmpy.is_square(b * b - 4 * a * c):
       t = gmpy.isqrt(b * b - 4 * a * c)
       for rt in (t, -t):
@@ -412,9 +480,11 @@ def CheckSmallUpperDifferences(n: int) -> Optional[list[int]]:
       2 ** (prime_size - 2),
       2 ** (prime_size - 3),
   ]
+  n = gmpy.mpz(n)
   for diff in differences:
     # find an approximation p0 for p such that p - n // q is approx. diff.
-    p0 = gmpy.isqrt(n + (diff // 2) ** 2) + diff // 2
+    c = diff >> 1
+    p0 = gmpy.isqrt(n + c * c) + c
     factors = special_case_factoring.FactorWithGuess(n, p0)
     if factors:
       return factors
@@ -422,7 +492,10 @@ def CheckSmallUpperDifferences(n: int) -> Optional[list[int]]:
 
 
 def Pollardpm1(
-    n: int, m: Optional[int] = None, gcd_bound: int = 2**60
+    n: int,
+    m: Optional[int] = None,
+    gcd_bound: int = 2**60,
+    m_residue: Optional[int] = None,
 ) -> tuple[bool, list[int]]:
   """Checks if an RSA modulus is factorable by pollard p-1 method.
 
@@ -456,18 +529,29 @@ def Pollardpm1(
         2**60 is a reasonable value to skip possible true random keys. A
         drawback is that it can also skip the test when only p-1 (but not q-1)
         is smooth enough.
+      m_residue: m % (n - 1) if already known. Since m is typically much larger
+        than n, this value is used to compute gcd(n-1, m) faster. See
+        BatchPollardpm1.
 
   Returns:
       A tuple (weak, factors), where the value weak is True if the modulus
       is weak, and a list of factors that were found. When both p-1 and q-1 are
       smooth enough, the function returns True but an empty list of factors.
-      In that case, divisors of m can be tried instead.
+      In that case, divisors of m can be tried instead. Moduli with a prime
+      factor smaller than 10**4 are always reported as weak.
   """
+  # Trial division by small primes. Such factors would also be found by the
+  # modular exponentiation below, but a single gcd is much cheaper.
+  p = gmpy.gcd(n, _SMALL_PRIMES_PRODUCT)
+  if 1 < p < n:
+    return True, [p, n // p]
   # Using a = 2^(n-1) instead of a = 2 extends the test to cases where
   # p = b*m + 1 and q = c*m + 1, and where either b or c is smooth.
-  if gmpy.gcd(n - 1, m) >= gcd_bound:
-    a = pow(2, n - 1, n)
-    p = gmpy.gcd(pow(a, m, n) - 1, n)
+  # a^m is computed as 2^((n-1)*m) with a single modular exponentiation.
+  if m_residue is None:
+    m_residue = m
+  if gmpy.gcd(n - 1, m_residue) >= gcd_bound:
+    p = gmpy.gcd(pow(2, (n - 1) * m, n) - 1, n)
     if 1 < p < n:
       return True, [p, n // p]
     if p == n:
@@ -475,6 +559,45 @@ def Pollardpm1(
   return False, []
 
 
+def BatchPollardpm1(
+    moduli: list[int], m: int, gcd_bound: int = 2**60
+) -> list[tuple[bool, list[int]]]:
+  """Runs Pollardpm1 for a list of RSA moduli with the same m.
+
+  For typical parameters m is much larger than the moduli and most moduli are
+  skipped because gcd(n-1, m) < gcd_bound. Reducing m modulo all the values
+  n - 1 with a remainder tree makes this test several times faster than
+  reducing m for each modulus separately.
+
+  Args:
+      moduli: the RSA moduli to check.
+      m: A pre-calculated guess for K*(p-1).
+      gcd_bound: the bound for gcd(n-1, m) used by Pollardpm1.
+
+  Returns:
+      A list with the result of Pollardpm1 for each modulus.
+  """
+  # Moduli n <= 1 are passed without a residue, as n - 1 is not a valid
+  # modulus for the remainder tree. The other moduli are split into chunks
+  # whose product has about the size of m, since reducing m modulo larger
+  # products of the tree would leave m unchanged.
+  residues = [None] * len(moduli)
+  indices = [i for i, n in enumerate(moduli) if n > 1]
+  if indices:
+    max_bits = max(moduli[i].bit_length() for i in indices)
+    chunk_size = max(1, m.bit_length() // max_bits)
+    for start in range(0, len(indices), chunk_size):
+      chunk = indices[start:start + chunk_size]
+      chunk_residues = ntheory_util.RemainderTree(
+          m, [moduli[i] - 1 for i in chunk]
+      )
+      for i, r in zip(chunk, chunk_residues):
+        residues[i] = r
+  return [
+      Pollardpm1(n, m, gcd_bound, m_residue=r) for n, r in zip(moduli, residues)
+  ]
+
+
 def CheckLowHammingWeight(
     n: int, cutoff: int = 2500, maxsteps: int = 10**6
 ) -> tuple[bool, list[int]]:
@@ -489,10 +612,10 @@ def CheckLowHammingWeight(
       n: the modulus to test
       cutoff: the number or steps after which the search is abandoned if no
         promissing branch has been found. The default of 2500 means that the
-        function takes about 100 ms when n is not a product of factors with a
+        function takes a few ms when n is not a product of factors with a
         low Hamming weight.
       maxsteps: an upper bound on the maximal number of steps. The default value
-        10**6 means that the search spends about 20 seconds before giving up. A
+        10**6 means that the search spends about 2 seconds before giving up. A
         value of 10**7 is the largest value tested with 64 GB of memory.
 
   Returns:
@@ -514,6 +637,35 @@ def CheckLowHammingWeight(
            of two factors of very low Hamming weight often has other partial
            factorizations with low Hamming weight.
   """
+  weak, p, q = low_hamming_weight.LowHammingWeight(
+      int(n).to_bytes((n.bit_length() + 7) // 8, "big"), cutoff, maxsteps
+  )
+  if p:
+    return weak, [gmpy.mpz(int.from_bytes(p, "big")),
+                  gmpy.mpz(int.from_bytes(q, "big"))]
+  return weak, []
+
+
+def CheckLowHammingWeightNative(
+    n: int, cutoff: int = 2500, maxsteps: int = 10**6
+) -> tuple[bool, list[int]]:
+  """Python implementation of CheckLowHammingWeight.
+
+  CheckLowHammingWeightNative and CheckLowHammingWeight are identical
+  functions. CheckLowHammingWeight uses a C++ implementation of the search
+  below, which is much faster. This implementation documents the algorithm
+  and is used to test the C++ implementation.
+
+  Args:
+      n: the modulus to test
+      cutoff: the number or steps after which the search is abandoned if no
+        promissing branch has been found.
+      maxsteps: an upper bound on the maximal number of steps.
+
+  Returns:
+      A tuple (weak, factors), where the value weak is True if the modulus
+      is (probably) weak, and a list of factors that were found.
+  """
 
   def Heuristic(hamming_weight: int, rem_size: int) -> int:
     """The heuristic used for the search.
@@ -534,15 +686,25 @@ def CheckLowHammingWeight(
     """
     return rem_size + 5 * hamming_weight
 
-  # A heap containing partial factorizations.
-  # This heap is being used by the function Push below.
-  # Elements in the heap are quintuples (v, hw, bit, p0, q0) where:
-  #   v: is the result of the function Heuristic above.
-  #   hw: is the sum of the Hamming weights of p0 and q0.
-  #   bit: is the number of missing bits in p0 and q0.
-  #   p0: a guess for the msbs of p, i.e., the value p >> bit.
-  #   q0: a guess for the msbs of q, i.e., the value q >> bit.
-  heap = []
+  # Partial factorizations are stored in parallel lists indexed by a handle h:
+  #   ps[h]: a guess for the msbs of p, i.e., the value p >> bits[h].
+  #   qs[h]: a guess for the msbs of q, i.e., the value q >> bits[h].
+  #   hws[h]: the sum of the Hamming weights of ps[h] and qs[h].
+  #   bits[h]: the number of missing bits in ps[h] and qs[h].
+  # Handles of entries removed from the priority queue are reused.
+  ps, qs, hws, bits = [], [], [], []
+  free_handles = []
+  # A bucket queue containing the handles of partial factorizations.
+  # buckets[v] contains the handles of all entries where v is the result of the
+  # function Heuristic above. Since v is a small non-negative integer, this
+  # allows to push and pop entries in constant time. Since the Hamming weight
+  # and the size of the remainder are both at most n.bit_length() + 1, v is at
+  # most 6 * n.bit_length() + 6.
+  # The bucket queue is being used by the functions Push and Pop below.
+  buckets = [[] for _ in range(6 * n.bit_length() + 8)]
+  # min_bucket is a lower bound for the index of the first non-empty bucket.
+  min_bucket = len(buckets)
+  queue_size = 0
 
   def Push(p0: int, q0: int, hw: int, bit: int, rem_size: int):
     """Computes the heuristic and pushes the values into the priority queue.
@@ -554,13 +716,43 @@ def CheckLowHammingWeight(
       bit: the number of bits that are still to guess.
       rem_size: (n - (p << bit) * (q << bit)).bit_length()
     """
+    nonlocal min_bucket, queue_size
     # invariants:
     # assert (p0 << bit) * (q0 << bit) <= n < ((p0+1) << bit) * ((q0+1) << bit)
 
     # The algorithm looks for a factorization where p <= q.
     if p0 <= q0:
+      if free_handles:
+        h = free_handles.pop()
+        ps[h] = p0
+        qs[h] = q0
+        hws[h] = hw
+        bits[h] = bit
+      else:
+        h = len(ps)
+        ps.append(p0)
+        qs.append(q0)
+        hws.append(hw)
+        bits.append(bit)
       v = rem_size + 5 * hw
-      heapq.heappush(heap, (v, hw, bit, p0, q0))
+      buckets[v].append(h)
+      queue_size += 1
+      if v < min_bucket:
+        min_bucket = v
+
+  def Pop() -> tuple[int, int]:
+    """Removes an entry with minimal heuristic from the priority queue.
+
+    Returns:
+      a tuple (v, h), where v is the heuristic and h the handle of the entry.
+    """
+    nonlocal min_bucket, queue_size
+    while not buckets[min_bucket]:
+      min_bucket += 1
+    queue_size -= 1
+    h = buckets[min_bucket].pop()
+    free_handles.append(h)
+    return min_bucket, h
 
   # There are two thresholds for the heurisitic.
   # If no value of the heuristic smaller than threshold_cutoff is found then
@@ -579,32 +771,41 @@ def CheckLowHammingWeight(
   psize = (n.bit_length() + 1) // 2
   steps = 0
   remainder = n - (1 << (2 * (psize - 1)))
-  Push(1, 1, 2, psize - 1, remainder.bit_length())
+  # Starting with mpz values avoids mixing Python integers and mpz below.
+  Push(gmpy.mpz(1), gmpy.mpz(1), 2, psize - 1, remainder.bit_length())
   # smallest value for the heuristic
   minv = Heuristic(2, remainder.bit_length())
-  while steps < maxsteps and heap:
+  while steps < maxsteps and queue_size:
     steps += 1
     if steps == cutoff:
       if minv >= threshold_cutoff:
         break
 
-    v, hw, bit, p, q = heapq.heappop(heap)
+    v, h = Pop()
+    hw, bit, p, q = hws[h], bits[h], ps[h], qs[h]
     if v < minv:
       minv = v
     # Doing computations on the msbs only saves 40% CPU time.
+    # The loop invariant is rem == (n >> (2 * bit)) - p * q. Shifting p and q
+    # multiplies p * q by 4, hence rem can be updated without multiplications.
+    # rem is an xmpz, so that it is updated in place.
+    rem = gmpy.xmpz((n >> (2 * bit)) - p * q)
     while bit >= 1:
       p <<= 1
       q <<= 1
       bit -= 1
-      n0 = n >> (2 * bit)
-      for dp, dq in ((0, 1), (1, 0), (1, 1)):
-        # min = pq + p, pq + q, pq + p + q + 1
+      rem <<= 2
+      rem += (n >> (2 * bit)) & 3
+      # p0 * q0 is one of pq + p, pq + q, pq + p + q + 1
+      rem_p = rem - p
+      rem_q = rem - q
+      for dp, dq, rem0 in ((0, 1, rem_p), (1, 0, rem_q), (1, 1, rem_p - q - 1)):
         p0 = p + dp
         q0 = q + dq
         # The algorithm guesses at this point that the factors of n are
         # in the range [p0 << bit, (p0 + 1) << bit]
         # and the range [p1 << bit, (p1 + 1) << bit].
-        rem0 = n0 - p0 * q0
+        # Here rem0 == (n >> (2 * bit)) - p0 * q0.
         if rem0 < 0:
           break
         if bit:
@@ -61,6 +61,17 @@ class RsaUtilTest(absltest.TestCase):
         rsa_util.BatchGCD([2 * 3, 2 * 5, 3 * 5]), [2 * 3, 2 * 5, 3 * 5]
     )
 
+  def testBatchGcdContext(self):
+    context = rsa_util.BatchGCDContext([3 * 7, 13])
+    self.assertEqual(context.product, 3 * 7 * 13)
+    self.assertEqual(context.BatchGCD([5 * 7, 11, 17]), [7, 1, 1])
+    context.Add([17 * 19])
+    self.assertEqual(context.BatchGCD([5 * 7, 11, 17]), [7, 1, 17])
+    self.assertEqual(context.BatchGCD([2 * 5, 5 * 11]), [5, 5])
+    self.assertEqual(
+        rsa_util.BatchGCDContext().BatchGCD([2 * 3, 3 * 5, 7]), [3, 3, 1]
+    )
+
   def testFermat(self):
     p_fermat = gmpy.next_prime(random.getrandbits(1024))
     q_fermat = gmpy.next_prime(p_fermat + 2**100)
@@ -75,6 +86,50 @@ class RsaUtilTest(absltest.TestCase):
     result = rsa_util.FermatFactor(q_fermat * q_fermat, max_steps)
     self.assertEqual(result[0] * result[1], q_fermat * q_fermat)
 
+  def testFactorHighAndLowBitsEqual(self):
+    p = 0xCB557401230321B723A2342377A28249
+    q = 0xCB557401A315C42E24CC6AAA77A28249
+    self.assertEqual(rsa_util.FactorHighAndLowBitsEqual(p * q), [p, q])
+    # n % 8 != 1, hence the method is not applicable.
+    self.assertIsNone(rsa_util.FactorHighAndLowBitsEqual(p * (q + 2)))
+
+  def testLowHammingWeight(self):
+    def LowWeightPrime(size, weight):
+      while True:
+        p = 2 ** (size - 1) + 1
+        for i in random.sample(range(1, size - 1), weight - 2):
+          p += 2**i
+        if gmpy.is_prime(p):
+          return p
+
+    # Primes with Hamming weight 32 that the search factors within the default
+    # number of steps.
+    p_fixed = int(
+        '880000000800008002000022040000018000050000100000000040004480020000'
+        '00000800400000080040040100000000000000001000200000008000388001',
+        16,
+    )
+    q_fixed = int(
+        '800000004200400000080800800201000001000010020000002040000040000000'
+        '00000000c0040000000001000004000000c008000a100c0000004810000001',
+        16,
+    )
+    weak, factors = rsa_util.CheckLowHammingWeight(p_fixed * q_fixed)
+    self.assertTrue(weak)
+    self.assertEqual(sorted(factors), sorted([p_fixed, q_fixed]))
+    p = LowWeightPrime(512, 32)
+    q = LowWeightPrime(512, 32)
+    # The C++ implementation and the Python implementation must return the
+    # same results.
+    p_random = gmpy.next_prime(random.getrandbits(512) | 2**511)
+    q_random = gmpy.next_prime(random.getrandbits(512) | 2**511)
+    for n in [p * q, p_random * q_random, p * q_random, 1, 15]:
+      for maxsteps in [1, 100, 10000]:
+        self.assertEqual(
+            rsa_util.CheckLowHammingWeight(n, maxsteps=maxsteps),
+            rsa_util.CheckLowHammingWeightNative(n, maxsteps=maxsteps),
+        )
+
   def testPollardpm1(self):
     # Only p-1 is smooth enough:
     res, factors = rsa_util.Pollardpm1(
@@ -100,6 +155,26 @@ class RsaUtilTest(absltest.TestCase):
     self.assertFalse(res)
     self.assertEmpty(factors)
 
+    # Batch version:
+    results = rsa_util.BatchPollardpm1(
+        [23 * 47, 29 * 59, 83 * 107], m=2 * 3 * 5 * 7 * 11 * 23, gcd_bound=1
+    )
+    self.assertEqual(results, [(True, []), (True, [29, 59]), (False, [])])
+    # A modulus n = 1 gives the same result as the single modulus version and
+    # does not abort the batch. m is smaller than the product of the moduli, so
+    # the remainders are computed over several chunks.
+    moduli = [gmpy.mpz(1), 23 * 47, 29 * 59, 83 * 107, 2**61 - 1, 2**89 - 1]
+    m = 2 * 3 * 5 * 7 * 11 * 23
+    self.assertEqual(
+        rsa_util.BatchPollardpm1(moduli, m=m, gcd_bound=1),
+        [rsa_util.Pollardpm1(n, m=m, gcd_bound=1) for n in moduli],
+    )
+
+    # Small factors are found by trial division, independently of m:
+    res, factors = rsa_util.Pollardpm1(101 * (2**127 - 1), m=2)
+    self.assertTrue(res)
+    self.assertEqual(factors, [101, 2**127 - 1])
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -14,6 +14,7 @@
 """Set of functions to find small roots of polynomials modulo an integer."""
 
 import itertools
+import math
 from typing import Optional
 import gmpy2 as gmpy
 from paranoid_crypto.lib import linalg_util
@@ -21,14 +22,76 @@ from paranoid_crypto.lib import lll
 import sympy
 
 
-def _get_monomials(f: sympy.Poly) -> list[sympy.Poly]:
-  mons = []
-  for exps in f.monoms():
-    mon = 1
-    for i in range(len(exps)):
-      mon *= f.gens[i] ** exps[i]
-    mons.append(sympy.Poly(mon, *f.gens))
-  return mons
+def _get_powers(f: sympy.Poly, m: int) -> list[sympy.Poly]:
+  pows = [sympy.Poly(1, *f.gens)]
+  for _ in range(m):
+    pows.append(pows[-1] * f)
+  return pows
+
+
+def _divide_monomial(
+    mon: tuple[int, ...], l: tuple[int, ...], k: int
+) -> Optional[tuple[int, ...]]:
+  """Returns the exponents of mon / l**k or None if l**k does not divide mon."""
+  quot = tuple(e - k * le for e, le in zip(mon, l))
+  if min(quot) < 0:
+    return None
+  return quot
+
+
+def _get_exponents(mons: list[sympy.Poly]) -> list[tuple[int, ...]]:
+  return [mon.monoms()[0] for mon in mons]
+
+
+def _eval_monomials(
+    mon_exps: list[tuple[int, ...]], values: list[int]
+) -> list[gmpy.mpz]:
+  """Returns the values of monomials, given by their exponents, at values."""
+  max_exp = max(max(exps) for exps in mon_exps)
+  pows = []
+  for v in values:
+    v_pows = [gmpy.mpz(1)]
+    for _ in range(max_exp):
+      v_pows.append(v_pows[-1] * v)
+    pows.append(v_pows)
+  return [
+      math.prod((v_pows[e] for v_pows, e in zip(pows, exps)), start=1)
+      for exps in mon_exps
+  ]
+
+
+def _roots_from_powers(
+    mon_exps: list[tuple[int, ...]], values: list[gmpy.mpq]
+) -> Optional[list[int]]:
+  """Recovers candidate roots from the values of monomials x_i**e.
+
+  For each variable, the monomial with the smallest exponent among those that
+  are a pure power of that variable is used. Even powers only give the
+  non-negative root.
+
+  Args:
+    mon_exps: exponents of the monomials.
+    values: values of the monomials.
+
+  Returns:
+    A list with one candidate root per variable, or None if some variable does
+    not appear as a pure power or its value is not an exact power.
+  """
+  roots = []
+  for i in range(len(mon_exps[0])):
+    powers = [(exps[i], value)
+              for exps, value in zip(mon_exps, values)
+              if exps[i] and sum(exps) == exps[i]]
+    if not powers:
+      return None
+    e, value = min(powers, key=lambda power: power[0])
+    if value.denominator != 1 or (value < 0 and e % 2 == 0):
+      return None
+    root, exact = gmpy.iroot(abs(value.numerator), e)
+    if not exact:
+      return None
+    roots.append(int(-root if value < 0 else root))
+  return roots
 
 
 def univariate_modp(f: sympy.Poly, b: int, k: int = 3) -> Optional[int]:
@@ -76,34 +139,46 @@ def univariate_modp(f: sympy.Poly, b: int, k: int = 3) -> Optional[int]:
   pols = []
   xb = sympy.Poly(x * b)
   t = fz.compose(xb)
+  xb_pows = _get_powers(xb, d * k - 1)
+  t_pows = _get_powers(t, k)
   for i in range(k):
-    g = t**i * n ** (k - i)
+    g = t_pows[i] * n ** (k - i)
     for j in range(d):
-      pols.append(xb**j * g)
-  g = t**k
+      pols.append(xb_pows[j] * g)
+  g = t_pows[k]
   for i in range(d * k):
-    pols.append(xb**i * g)
+    pols.append(xb_pows[i] * g)
 
   # create the lattice using the coefficients
   lat = [[0] * dim for _ in range(dim)]
   for i in range(dim):
-    coeffs = pols[i].all_coeffs()[::-1]
+    coeffs = pols[i].as_dict(native=True)
     for j in range(i + 1):
-      lat[i][j] = coeffs[j]
+      lat[i][j] = coeffs.get((j,), 0)
 
   lat = lll.reduce(lat)
 
-  # reconstruct polynomial
-  poly = sympy.Poly(sum(x**i * (lat[0][i] // b**i) for i in range(dim)))
+  # reconstruct polynomials
+  poly, poly2 = [
+      sympy.Poly.from_list([row[i] // b**i for i in reversed(range(dim))], x)
+      for row in lat[:2]
+  ]
 
   # Look for a linear/irreducible factor of the form a*x + b. Thus, the root
   # will be -b/a. This approach is much faster than calling one of the root
   # methods provided by sympy.
-  for factor in poly.factor_list_include():
-    rx = -factor[0].TC() // factor[0].LC()
-    y = f(rx)
-    if y != 0 and n % y == 0:
-      return rx
+  # Typically, the first two rows of the reduced lattice both vanish at the
+  # root over the integers. Their gcd then has a small degree and is much
+  # faster to factor than the first row. The first row is only factored if
+  # the gcd does not contain the root.
+  for pol in (poly.gcd(poly2), poly):
+    if pol.degree() < 1:
+      continue
+    for factor in pol.factor_list_include():
+      rx = -factor[0].TC() // factor[0].LC()
+      y = f(rx)
+      if y != 0 and n % y == 0:
+        return rx
   return None
 
 
@@ -168,14 +243,26 @@ def multivariate_modp(
   # Herrmann and May suggest optimzed value t = tau*m, where
   # tau = 1-(1-beta)**(1/l). Assuming balanced RSA modulus, beta = 0.5:
   t = max(1, int((1 - (0.5) ** (1 / l)) * m))
+  # Even with arbitrarily large lattices, the method only finds roots if the
+  # product of the bounds is smaller than n**delta, where
+  # delta = 1 - (1-beta)**((l+1)/l) - (l+1)*(1-(1-beta)**(1/l))*(1-beta).
+  # Larger bounds are rejected without computing the lattice.
+  delta = 1 - 0.5 ** ((l + 1) / l) - (l + 1) * (1 - 0.5 ** (1 / l)) * 0.5
+  # Compared using bit lengths, as the bounds may be too large for floats.
+  # bit_length() - 1 <= log2(b) and log2(n) <= bit_length(), so only bounds
+  # that are certainly too large are rejected.
+  bounds_bits = sum(int(b).bit_length() - 1 for b in bounds)
+  if bounds_bits > delta * int(n).bit_length():
+    return None
 
   # Compute polynomials. Each polynomial adds a new monomial.
   pols = []
   mons = []
   all_idxs = list(itertools.product(range(m + 1), repeat=l - 1))
+  fz_pows = _get_powers(fz, m)
   for k in range(m + 1):
     idxs = [idx for idx in all_idxs if sum(idx) <= m - k]
-    g = fz**k * n ** max(t - k, 0)
+    g = fz_pows[k] * n ** max(t - k, 0)
     mon = xs[0] ** k
     for ijs in idxs:
       t1 = 1
@@ -185,24 +272,21 @@ def multivariate_modp(
       mons.append(t1 * mon)
   dim = len(pols)
 
-  # create the lattice using the coefficients
+  # create the lattice using the coefficients. Substituting xs[v] by
+  # xs[v] * bounds[v] multiplies the coefficient of each monomial by the value
+  # of the monomial at the bounds.
+  mon_exps = _get_exponents([sympy.Poly(mon, *xs) for mon in mons])
+  scales = _eval_monomials(mon_exps, bounds)
   lat = [[0] * dim for _ in range(dim)]
-  params = [sympy.Poly(xs[i] * bounds[i]) for i in range(l)]
   for i in range(dim):
-    lat[i][0] = pols[i].TC()
-    pol = pols[i]
-    for v in range(l):
-      pol = sympy.compose(pol, params[v], xs[v])
-    pol = sympy.Poly(pol, *xs)
-    for j in range(1, i + 1):
-      lat[i][j] = pol.coeff_monomial(mons[j])
+    coeffs = sympy.Poly(pols[i], *xs).as_dict(native=True)
+    for j in range(i + 1):
+      lat[i][j] = coeffs.get(mon_exps[j], 0) * scales[j]
 
   lat = lll.reduce(lat)
 
   # reconstruct polynomials
-  for i in range(dim):
-    for j in range(dim):
-      lat[i][j] = gmpy.mpz(lat[i][j]) // int(sympy.Poly(mons[j], *xs)(*bounds))
+  lat = [[gmpy.mpz(v) // s for v, s in zip(row, scales)] for row in lat]
 
   # NOTE(pedroysb): Under the assumption that the lattice-based construction
   # yields algebraically independent polynomials, some papers suggest computing
@@ -267,47 +351,53 @@ def multivariate_modn(
   n = f.get_modulus()
   fz = f.monic().set_domain(sympy.ZZ)
   xs = fz.gens
+  fz_pows = _get_powers(fz, m)
+  # Monomials are represented by their exponent vectors.
   # Let l be the leading monomial
-  l = _get_monomials(fz)[0]
+  l = fz.monoms()[0]
   # Define the sets M_k of monomials
   mks = []
-  mons = _get_monomials(fz**m)
+  mons = fz_pows[m].monoms()
   for k in range(m + 1):
-    fmk_mons = _get_monomials(fz ** (m - k))
-    mk = {mon for mon in mons if mon // l**k in fmk_mons}
+    fmk_mons = set(fz_pows[m - k].monoms())
+    mk = {mon for mon in mons if _divide_monomial(mon, l, k) in fmk_mons}
     mks.append(mk)
   mks.append(set())
   # Define the shift polynomials
   pols = []
   for k in range(m + 1):
-    diffs = mks[k] - mks[k + 1]
-    g = fz**k * n ** (m - k)
-    for mon in diffs:
-      pols.append((mon // l**k) * g)
+    g = fz_pows[k] * n ** (m - k)
+    for mon in mons:
+      if mon in mks[k] and mon not in mks[k + 1]:
+        shift = sympy.Poly.from_dict({_divide_monomial(mon, l, k): 1}, *xs)
+        pols.append(shift * g)
   dim = len(pols)
 
-  # create the lattice using the coefficients
+  # create the lattice using the coefficients, scaled as in multivariate_modp
+  scales = _eval_monomials(mons, bounds)
   lat = [[0] * dim for _ in range(dim)]
-  params = [sympy.Poly(xs[i] * bounds[i]) for i in range(len(xs))]
   for i in range(dim):
-    pol = pols[i]
-    for v in range(len(xs)):
-      pol = sympy.compose(pol, params[v], xs[v])
-    pol = sympy.Poly(pol, *xs)
-    lat[i] = [pol.coeff_monomial(mons[j].as_expr()) for j in range(dim)]
+    coeffs = sympy.Poly(pols[i], *xs).as_dict(native=True)
+    lat[i] = [coeffs.get(mons[j], 0) * scales[j] for j in range(dim)]
 
   lat = lll.reduce(lat)
 
-  # reconstruct polynomials
-  for i in range(dim):
-    for j in range(dim):
-      lat[i][j] = gmpy.mpz(lat[i][j]) // int(sympy.Poly(mons[j], *xs)(*bounds))
+  # reconstruct polynomials. Only the first dim - 1 rows are used.
+  lat = [[gmpy.mpz(v) // s for v, s in zip(row, scales)] for row in lat[:-1]]
   a = [lat[i][:-1] for i in range(dim - 1)]
   b = [-lat[i][-1] for i in range(dim - 1)]
   solutions = linalg_util.solve_right(a, b)
   if not solutions:
     return None
-  pols = [mons[j] - int(solutions[j]) for j in range(len(solutions))]
+  pols = [
+      sympy.Poly.from_dict({mons[j]: 1}, *xs) - int(solutions[j])
+      for j in range(len(solutions))
+  ]
+  # Shortcut for the common case where every variable appears alone in some
+  # monomial: its root is then an integer root of the solved value.
+  roots = _roots_from_powers(mons[:len(solutions)], solutions)
+  if roots is not None and int(f(*roots)) % n == 0:
+    return roots
   # TODO(pedroysb): Is there a better way to solve this without using sympy? For
   # very complex polynomials/monomials this may take a while...
   for roots in sympy.solve(pols, *xs, check=False, manual=True):
@@ -14,7 +14,9 @@
 """Tests for paranoid_crypto.lib.small_roots."""
 
 import random
+from unittest import mock
 from absl.testing import absltest
+import gmpy2 as gmpy
 from paranoid_crypto.lib import small_roots
 import sympy
 
@@ -121,6 +123,14 @@ class SmallRootsTest(absltest.TestCase):
     # With less known bits, 768, the factorization fails:
     roots, positions, p0 = bivariate_helper([130, 130])
     self.assertIsNone(roots)
+    # Bounds beyond the asymptotic bound of Herrmann and May are rejected for
+    # any lattice size:
+    roots, positions, p0 = bivariate_helper([220, 220], m=100)
+    self.assertIsNone(roots)
+    # The same holds for gmpy2 bounds whose product does not fit in a float:
+    f = sympy.Poly(x1 * 2**1024 + x2 + 1, modulus=n)
+    self.assertIsNone(
+        small_roots.multivariate_modp(f, [gmpy.mpz(2)**600] * 2, m=2))
     # But we are still able to factorize it using a larger lattice:
     roots, positions, p0 = bivariate_helper([130, 130], m=5)
     rx1, rx2 = roots
@@ -207,6 +217,21 @@ class SmallRootsTest(absltest.TestCase):
     rx1, rx2 = small_roots.multivariate_modn(f, [b1, b2])
     self.assertEqual((p0 + rx1**2) * (q0 + rx2**3), n)
 
+  def testBivariateModnCrossTerms(self):
+    x1, x2 = sympy.symbols("x1, x2")
+    unknown_bits_x1, unknown_bits_x2 = 128, 128
+    b1, b2 = 2**unknown_bits_x1, 2**unknown_bits_x2
+    rx1, rx2 = random.randint(1, b1), random.randint(1, b2)
+    p0 = p - rx1 * rx2
+    q0 = n // p - rx2
+    # x1 only appears in monomials together with x2, hence its root cannot be
+    # read directly from a pure power and sympy.solve is used instead.
+    f = sympy.Poly((p0 + x1 * x2) * (q0 + x2), modulus=n)
+    with mock.patch.object(sympy, "solve", wraps=sympy.solve) as solve:
+      rx1, rx2 = small_roots.multivariate_modn(f, [b1, b2])
+    solve.assert_called()
+    self.assertEqual((p0 + rx1 * rx2) * (q0 + rx2), n)
+
 
 if __name__ == "__main__":
   absltest.main()
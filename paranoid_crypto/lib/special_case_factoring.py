@@ -17,6 +17,7 @@ The motivaton behind these algorithm is that RSA moduli can often be factored
 if partial information about the prime numbers is known.
 """
 
+import functools
 from typing import Optional
 import gmpy2 as gmpy
 from paranoid_crypto.lib import ntheory_util
@@ -62,6 +63,18 @@ def FactorWithGuess(n: int, p_0: int) -> Optional[list[int]]:
   Returns:
     A factorization [p, q] of n or None if no factor could be found.
   """
+  factors = _CachedFactorWithGuess(n, p_0)
+  if factors is None:
+    return None
+  return list(factors)
+
+
+# Checks may try the same guess for a modulus more than once, e.g. when the
+# same key is checked repeatedly. Results are cached for the lifetime of the
+# process.
+@functools.lru_cache(maxsize=4096)
+def _CachedFactorWithGuess(n: int, p_0: int) -> Optional[tuple[int, int]]:
+  """Implements FactorWithGuess, but returns a tuple so it can be cached."""
   q_0 = n // p_0
 
   # Finds an approximation bound = n ** (1 / 3)
@@ -83,13 +96,20 @@ def FactorWithGuess(n: int, p_0: int) -> Optional[list[int]]:
     # odd.
     if abs(u * q_0 - v * p_0) < bound:
       d = 4 * u * v * n
-      a = gmpy.isqrt(d)
-      if a * a < d:
+      a, r = gmpy.isqrt_rem(d)
+      if r:
         a += 1
-      if gmpy.is_square(a * a - d):
-        b = gmpy.isqrt(a * a - d)
+      b2 = a * a - d
+      # is_square rejects most non-squares with cheap residue tests, hence it
+      # is faster than always computing the square root with iroot.
+      if gmpy.is_square(b2):
+        b = gmpy.isqrt(b2)
         g = gmpy.gcd(a + b, n)
         if 1 < g < n:
-          return [g, n // g]
-      return None
+          return g, n // g
+      # Later convergents approximate p_0 / q_0 better, hence they may still
+      # lead to a factorization. The search stops once u * v exceeds the
+      # bound from Lehman's method.
+      if u * v > bound:
+        return None
   return None
@@ -85,6 +85,25 @@ class SpecialCaseFactoringTest(absltest.TestCase):
     res = special_case_factoring.FactorWithGuess(n, p_0)
     self.assertIsNotNone(res)
     self.assertSameElements(res, [p, q])
+    # Repeated calls return the cached result in a new list.
+    res2 = special_case_factoring.FactorWithGuess(n, p_0)
+    self.assertEqual(res, res2)
+    self.assertIsNot(res, res2)
+
+  def testFactorWithGuessLaterConvergent(self):
+    """Checks a case where the first suitable convergent does not factor n.
+
+    Here the first convergent u / v of p_0 / q_0 that is close enough to the
+    guess does not lead to a factorization, but a later convergent does.
+    """
+    p = int(
+        "9a2ef80f58ee8571f4998d7c4093f6dea268aa872607679d6050914a9d33a025", 16)
+    q = int(
+        "fa529ba3fe3bfada7cf20724d953ee261d87cec31f7296ab7961fd925d39d181", 16)
+    p_0 = p >> 84 << 84
+    res = special_case_factoring.FactorWithGuess(p * q, p_0)
+    self.assertIsNotNone(res)
+    self.assertSameElements(res, [p, q])
 
 
 if __name__ == "__main__":
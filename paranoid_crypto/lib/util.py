@@ -14,10 +14,15 @@
 """Set of functions that are useful for paranoid library or its callers."""
 import ast
 from collections.abc import Iterable
+import functools
 from typing import Optional
+import gmpy2 as gmpy
 from paranoid_crypto import paranoid_pb2
 from paranoid_crypto import version
 
+_LIB_VERSION = version.__version__
+_MAX_SEVERITY = max(paranoid_pb2.SeverityType.values())
+
 
 def Hex2Bytes(hexstr_val: str) -> bytes:
   if len(hexstr_val) % 2 != 0:
@@ -30,9 +35,29 @@ def Bytes2Int(bytes_val: bytes) -> int:
 
 
 def Int2Bytes(int_val: int) -> bytes:
+  if isinstance(int_val, gmpy.mpz) and int_val >= 0:
+    # gmpy.to_binary returns a 2 byte header followed by the little-endian
+    # magnitude, which avoids converting int_val to a Python int first.
+    return gmpy.to_binary(int_val)[:1:-1]
   return int.to_bytes(int(int_val), (int_val.bit_length() + 7) // 8, 'big')
 
 
+def Int2BytesFixed(int_val: int, length: int) -> bytes:
+  """Converts int_val to a big-endian byte string of exactly length bytes.
+
+  Useful for values of a known width, e.g., EC coordinates or RSA signatures,
+  where leading zero bytes must be kept.
+
+  Args:
+    int_val: A non-negative integer smaller than 2**(8 * length).
+    length: The number of bytes of the result.
+
+  Returns:
+    The big-endian representation of int_val, padded with leading zeros.
+  """
+  return int.to_bytes(int(int_val), length, 'big')
+
+
 def GetHighestSeverity(test_info: paranoid_pb2.TestInfo) -> Optional[int]:
   """Returns the highest severity from all failed tests stored in test_info.
 
@@ -46,8 +71,12 @@ def GetHighestSeverity(test_info: paranoid_pb2.TestInfo) -> Optional[int]:
   """
   highest_severity = -1
   for test_result in test_info.test_results:
-    if test_result.result and test_result.severity > highest_severity:
-      highest_severity = test_result.severity
+    if test_result.result:
+      severity = test_result.severity
+      if severity == _MAX_SEVERITY:
+        return severity  # No other test can have a higher severity.
+      if severity > highest_severity:
+        highest_severity = severity
   return highest_severity if highest_severity != -1 else None
 
 
@@ -82,25 +111,62 @@ def SetTestResult(test_info: paranoid_pb2.TestInfo,
     test_result: An instance of paranoid_pb2.TestResultsEntry, to be
       stored/updated in test_info.
   """
+  _SetTestResult(test_info, GetTestResult(test_info, test_result.test_name),
+                 test_result)
+
+
+def SetTestResults(test_info: paranoid_pb2.TestInfo,
+                   test_results: Iterable[paranoid_pb2.TestResultsEntry]):
+  """Adds or updates many test results in a paranoid_pb2.TestInfo protobuf.
+
+  Same as calling SetTestResult for each test result, but test_info is only
+  scanned once.
+
+  Args:
+    test_info: An instance of paranoid_pb2.TestInfo protobuf, where test_results
+      attribute will be modified to store the test results.
+    test_results: Instances of paranoid_pb2.TestResultsEntry, to be
+      stored/updated in test_info.
+  """
+  old_test_results = {}
+  for old_test_result in test_info.test_results:
+    old_test_results.setdefault(old_test_result.test_name, old_test_result)
+  for test_result in test_results:
+    test_name = test_result.test_name
+    old_test_results[test_name] = _SetTestResult(
+        test_info, old_test_results.get(test_name), test_result)
+
+
+def _SetTestResult(
+    test_info: paranoid_pb2.TestInfo,
+    old_test_result: Optional[paranoid_pb2.TestResultsEntry],
+    test_result: paranoid_pb2.TestResultsEntry,
+) -> paranoid_pb2.TestResultsEntry:
+  """Updates old_test_result or adds test_result, returning the stored entry."""
   if not test_info.paranoid_lib_version:
     # Stores version value in test_info. As checks can be updated and become
     # stronger, this attribute can be useful to know when it makes sense to
     # re-execute a check against a crypto artifact.
-    test_info.paranoid_lib_version = version.__version__
+    test_info.paranoid_lib_version = _LIB_VERSION
 
-  if test_result.result:
+  result = test_result.result
+  if result and not test_info.weak:
     # When a key/signature is vulnerable to at least one test,
     # paranoid_pb2.TestInfo.weak should reflect that. We never set it to False,
     # as unknown weaknesses may exist.
     test_info.weak = True
 
-  old_test_result = GetTestResult(test_info, test_result.test_name)
   if old_test_result:
-    old_test_result.result |= test_result.result  # update
-    old_test_result.severity = max(old_test_result.severity,
-                                   test_result.severity)
-  else:
-    test_info.test_results.append(test_result)  # add new
+    # Update, only writing the fields that change.
+    if result and not old_test_result.result:
+      old_test_result.result = True
+    severity = test_result.severity
+    if severity > old_test_result.severity:
+      old_test_result.severity = severity
+    return old_test_result
+  test_results = test_info.test_results
+  test_results.append(test_result)  # add new
+  return test_results[-1]
 
 
 def GetAttachedInfo(test_info: paranoid_pb2.TestInfo,
@@ -132,13 +198,24 @@ def AttachInfo(test_info: paranoid_pb2.TestInfo, info_name: str, value: str):
       paranoid_pb2.AttachedInfoEntry.info_name.
     value: The value to be stored in paranoid_pb2.AttachedInfoEntry.value.
   """
-  old_attached_info = GetAttachedInfo(test_info, info_name)
+  _AttachInfo(test_info, GetAttachedInfo(test_info, info_name), info_name,
+              value)
+
+
+def _AttachInfo(
+    test_info: paranoid_pb2.TestInfo,
+    old_attached_info: Optional[paranoid_pb2.AttachedInfoEntry],
+    info_name: str,
+    value: str,
+) -> paranoid_pb2.AttachedInfoEntry:
+  """Updates old_attached_info or adds a new entry, returning the stored one."""
   if old_attached_info:
     old_attached_info.value = value  # update
-  else:
-    attached_info = test_info.attached_info.add()  # add new
-    attached_info.info_name = info_name
-    attached_info.value = value
+    return old_attached_info
+  attached_info = test_info.attached_info.add()  # add new
+  attached_info.info_name = info_name
+  attached_info.value = value
+  return attached_info
 
 
 def GetAttachedFactors(test_info: paranoid_pb2.TestInfo,
@@ -156,11 +233,21 @@ def GetAttachedFactors(test_info: paranoid_pb2.TestInfo,
   """
   attached_info = GetAttachedInfo(test_info, info_name)
   if attached_info:
-    factors_hex = ast.literal_eval(attached_info.value)
-    return {int(f_hex, 16) for f_hex in factors_hex}
+    return set(_ParseFactors(attached_info.value))
   return None
 
 
+@functools.lru_cache(maxsize=1024)
+def _ParseFactors(value: str) -> frozenset[int]:
+  """Parses factors stored by AttachFactors, caching by the stored value."""
+  if value.startswith('{') or value == 'set()':
+    # Older versions stored the string representation of a Python set.
+    factors_hex = ast.literal_eval(value)
+  else:
+    factors_hex = value.split(',') if value else []
+  return frozenset(int(f_hex, 16) for f_hex in factors_hex)
+
+
 def AttachFactors(test_info: paranoid_pb2.TestInfo, info_name: str,
                   factors: Iterable[int]):
   """Attachs a set of factors in test_info.attached_info with info_name.
@@ -170,7 +257,11 @@ def AttachFactors(test_info: paranoid_pb2.TestInfo, info_name: str,
   critical and it does not contain any logic. If one first attachs {2, 3} and
   {6} later, the final set will be {2, 3, 6}, i.e., it does not recognize that
   they are the same. Also, it does not store repeated values. E.g., factors of
-  12 may be stored as {2, 3}, not [2, 2, 3].
+  12 may be stored as {2, 3}, not [2, 2, 3]. The factors are stored as sorted,
+  comma separated hex values, e.g., "2,3". This format change is one-way:
+  GetAttachedFactors still reads the string representation of a set written
+  by older versions, but older versions cannot read values written by this
+  one.
 
   Args:
     test_info: An instance of paranoid_pb2.TestInfo protobuf, where
@@ -179,8 +270,52 @@ def AttachFactors(test_info: paranoid_pb2.TestInfo, info_name: str,
     factors: A set of factors to be stored.
   """
   factors = set(factors)
-  old_set = GetAttachedFactors(test_info, info_name)
-  if old_set:
-    factors = factors.union(old_set)  # update
-  new_set = {format(int(f), 'x') for f in factors}
-  AttachInfo(test_info, info_name, str(new_set))
+  attached_info = GetAttachedInfo(test_info, info_name)
+  if attached_info:
+    old_set = _ParseFactors(attached_info.value)
+    if factors <= old_set:
+      return  # nothing new to store
+    factors |= old_set  # update
+  # Sorted, so the same factors are always stored the same way.
+  new_set = ','.join(format(f, 'x') for f in sorted(factors))
+  _AttachInfo(test_info, attached_info, info_name, new_set)
+
+
+class TestInfoIndex:
+  """Indexes the test results and attached info of a TestInfo by name.
+
+  The module level functions scan test_info on every call, so N updates to the
+  same TestInfo take O(N^2) time. This class builds the name indexes once and
+  then gets/sets entries in O(1). While an instance is in use, test_info should
+  only be modified through it, otherwise the indexes may become stale.
+  """
+
+  def __init__(self, test_info: paranoid_pb2.TestInfo):
+    self.test_info = test_info
+    self._test_results = {}
+    for test_result in test_info.test_results:
+      self._test_results.setdefault(test_result.test_name, test_result)
+    self._attached_info = {}
+    for attached_info in test_info.attached_info:
+      self._attached_info.setdefault(attached_info.info_name, attached_info)
+
+  def GetTestResult(
+      self, test_name: str) -> Optional[paranoid_pb2.TestResultsEntry]:
+    """Same as the module level GetTestResult, for the indexed test_info."""
+    return self._test_results.get(test_name)
+
+  def SetTestResult(self, test_result: paranoid_pb2.TestResultsEntry):
+    """Same as the module level SetTestResult, for the indexed test_info."""
+    test_name = test_result.test_name
+    self._test_results[test_name] = _SetTestResult(
+        self.test_info, self._test_results.get(test_name), test_result)
+
+  def GetAttachedInfo(
+      self, info_name: str) -> Optional[paranoid_pb2.AttachedInfoEntry]:
+    """Same as the module level GetAttachedInfo, for the indexed test_info."""
+    return self._attached_info.get(info_name)
+
+  def AttachInfo(self, info_name: str, value: str):
+    """Same as the module level AttachInfo, for the indexed test_info."""
+    self._attached_info[info_name] = _AttachInfo(
+        self.test_info, self._attached_info.get(info_name), info_name, value)
@@ -0,0 +1,169 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for paranoid_crypto.lib.util.py."""
+
+from absl.testing import absltest
+import gmpy2 as gmpy
+from paranoid_crypto import paranoid_pb2
+from paranoid_crypto.lib import util
+
+_LOW = paranoid_pb2.SeverityType.SEVERITY_LOW
+_HIGH = paranoid_pb2.SeverityType.SEVERITY_HIGH
+
+
+class UtilTest(absltest.TestCase):
+
+  def testInt2Bytes(self):
+    for val in [0, 1, 255, 256, 2**1024 - 1, gmpy.mpz(2**521 + 1)]:
+      self.assertEqual(util.Bytes2Int(util.Int2Bytes(val)), val)
+      self.assertEqual(
+          util.Bytes2Int(util.Int2BytesFixed(val, 132)), val)
+      self.assertLen(util.Int2BytesFixed(val, 132), 132)
+    self.assertEqual(util.Int2Bytes(0), b'')
+    # The mpz fast path relies on the 2 byte header of gmpy.to_binary.
+    for val in [0, 1, 0x0102030405060708090A]:
+      self.assertEqual(
+          util.Int2Bytes(gmpy.mpz(val)),
+          int.to_bytes(val, (val.bit_length() + 7) // 8, 'big'),
+      )
+    self.assertEqual(util.Int2Bytes(gmpy.mpz(0)), b'')
+    self.assertEqual(util.Int2Bytes(gmpy.mpz(256)), b'\x01\x00')
+    with self.assertRaises(OverflowError):
+      util.Int2Bytes(gmpy.mpz(-1))
+    self.assertEqual(util.Int2Bytes(256), b'\x01\x00')
+    self.assertEqual(util.Int2BytesFixed(256, 4), b'\x00\x00\x01\x00')
+    with self.assertRaises(OverflowError):
+      util.Int2BytesFixed(256, 1)
+
+  def testGetHighestSeverity(self):
+    test_info = paranoid_pb2.TestInfo()
+    self.assertIsNone(util.GetHighestSeverity(test_info))
+    util.SetTestResult(
+        test_info,
+        paranoid_pb2.TestResultsEntry(test_name='A', severity=_HIGH))
+    self.assertIsNone(util.GetHighestSeverity(test_info))
+    util.SetTestResult(
+        test_info,
+        paranoid_pb2.TestResultsEntry(test_name='B', result=True,
+                                      severity=_LOW))
+    self.assertEqual(util.GetHighestSeverity(test_info), _LOW)
+    for name in ['C', 'D']:
+      util.SetTestResult(
+          test_info,
+          paranoid_pb2.TestResultsEntry(
+              test_name=name, result=True,
+              severity=paranoid_pb2.SeverityType.SEVERITY_CRITICAL))
+    self.assertEqual(util.GetHighestSeverity(test_info),
+                     paranoid_pb2.SeverityType.SEVERITY_CRITICAL)
+
+  def testSetTestResult(self):
+    test_info = paranoid_pb2.TestInfo()
+    util.SetTestResult(
+        test_info,
+        paranoid_pb2.TestResultsEntry(test_name='A', severity=_HIGH))
+    self.assertFalse(test_info.weak)
+    self.assertNotEmpty(test_info.paranoid_lib_version)
+    util.SetTestResult(
+        test_info,
+        paranoid_pb2.TestResultsEntry(test_name='A', result=True,
+                                      severity=_LOW))
+    self.assertTrue(test_info.weak)
+    self.assertLen(test_info.test_results, 1)
+    test_result = util.GetTestResult(test_info, 'A')
+    self.assertTrue(test_result.result)
+    self.assertEqual(test_result.severity, _HIGH)
+    self.assertIsNone(util.GetTestResult(test_info, 'B'))
+
+  def testSetTestResults(self):
+    test_results = [
+        paranoid_pb2.TestResultsEntry(test_name='A', severity=_HIGH),
+        paranoid_pb2.TestResultsEntry(test_name='B'),
+        paranoid_pb2.TestResultsEntry(test_name='A', result=True,
+                                      severity=_LOW),
+    ]
+    test_info = paranoid_pb2.TestInfo()
+    util.SetTestResult(test_info, paranoid_pb2.TestResultsEntry(test_name='B'))
+    expected = paranoid_pb2.TestInfo()
+    expected.CopyFrom(test_info)
+    util.SetTestResults(test_info, test_results)
+    for test_result in test_results:
+      util.SetTestResult(expected, test_result)
+    self.assertEqual(test_info, expected)
+    self.assertTrue(test_info.weak)
+    self.assertLen(test_info.test_results, 2)
+
+  def testAttachInfo(self):
+    test_info = paranoid_pb2.TestInfo()
+    util.AttachInfo(test_info, 'a', '1')
+    util.AttachInfo(test_info, 'b', '2')
+    util.AttachInfo(test_info, 'a', '3')
+    self.assertLen(test_info.attached_info, 2)
+    self.assertEqual(util.GetAttachedInfo(test_info, 'a').value, '3')
+    self.assertIsNone(util.GetAttachedInfo(test_info, 'c'))
+
+  def testAttachFactors(self):
+    test_info = paranoid_pb2.TestInfo()
+    self.assertIsNone(util.GetAttachedFactors(test_info, 'f'))
+    util.AttachFactors(test_info, 'f', [])
+    self.assertEqual(util.GetAttachedFactors(test_info, 'f'), set())
+    util.AttachFactors(test_info, 'f', [2, 3, gmpy.mpz(2**127 - 1)])
+    util.AttachFactors(test_info, 'f', [3, 6])
+    self.assertLen(test_info.attached_info, 1)
+    self.assertEqual(
+        util.GetAttachedFactors(test_info, 'f'), {2, 3, 6, 2**127 - 1})
+    # Callers get their own copy of the cached set.
+    util.GetAttachedFactors(test_info, 'f').add(5)
+    self.assertNotIn(5, util.GetAttachedFactors(test_info, 'f'))
+    util.AttachFactors(test_info, 'h', [gmpy.mpz(255), 16, 2])
+    self.assertEqual(util.GetAttachedInfo(test_info, 'h').value, '2,10,ff')
+    # Attaching known factors does not rewrite the stored value.
+    util.AttachFactors(test_info, 'h', [gmpy.mpz(16), 2])
+    self.assertEqual(util.GetAttachedInfo(test_info, 'h').value, '2,10,ff')
+    util.AttachInfo(test_info, 'h', '10,2')
+    util.AttachFactors(test_info, 'h', [2])
+    self.assertEqual(util.GetAttachedInfo(test_info, 'h').value, '10,2')
+    # Factors stored as the string representation of a set are still read.
+    util.AttachInfo(test_info, 'g', str({'2', 'ff'}))
+    self.assertEqual(util.GetAttachedFactors(test_info, 'g'), {2, 255})
+    util.AttachInfo(test_info, 'g', str(set()))
+    self.assertEqual(util.GetAttachedFactors(test_info, 'g'), set())
+
+  def testTestInfoIndex(self):
+    test_info = paranoid_pb2.TestInfo()
+    util.SetTestResult(test_info,
+                       paranoid_pb2.TestResultsEntry(test_name='A'))
+    util.AttachInfo(test_info, 'a', '1')
+    index = util.TestInfoIndex(test_info)
+    index.SetTestResult(
+        paranoid_pb2.TestResultsEntry(test_name='A', result=True,
+                                      severity=_LOW))
+    index.SetTestResult(paranoid_pb2.TestResultsEntry(test_name='B'))
+    index.AttachInfo('a', '2')
+    index.AttachInfo('b', '3')
+    self.assertTrue(test_info.weak)
+    self.assertLen(test_info.test_results, 2)
+    self.assertLen(test_info.attached_info, 2)
+    # The index and the module level functions see the same entries.
+    for name in ['A', 'B', 'C']:
+      self.assertEqual(
+          index.GetTestResult(name), util.GetTestResult(test_info, name))
+    for name in ['a', 'b', 'c']:
+      self.assertEqual(
+          index.GetAttachedInfo(name), util.GetAttachedInfo(test_info, name))
+    self.assertTrue(index.GetTestResult('A').result)
+    self.assertEqual(index.GetAttachedInfo('a').value, '2')
+
+
+if __name__ == '__main__':
+  absltest.main()
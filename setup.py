@@ -36,6 +36,15 @@ _BM_CC_HEADERS = [
     'paranoid_crypto/lib/randomness_tests/cc_util/berlekamp_massey.h',
 ]
 
+_LHW_CC_SOURCES = [
+    'paranoid_crypto/lib/cc_util/low_hamming_weight.cc',
+    'paranoid_crypto/lib/cc_util/pybind/low_hamming_weight.cc',
+]
+
+_LHW_CC_HEADERS = [
+    'paranoid_crypto/lib/cc_util/low_hamming_weight.h',
+]
+
 
 def _get_extra_compile_args():
   """Return extra compiler flags.
@@ -64,7 +73,13 @@ _EXT_MODULES = [
         sources=_BM_CC_SOURCES,
         depends=_BM_CC_HEADERS,
         include_dirs=['./'],
-        extra_compile_args=_get_extra_compile_args())
+        extra_compile_args=_get_extra_compile_args()),
+    Pybind11Extension(
+        'paranoid_crypto.lib.cc_util.pybind.low_hamming_weight',
+        sources=_LHW_CC_SOURCES,
+        depends=_LHW_CC_HEADERS,
+        include_dirs=['./'],
+        libraries=['gmpxx', 'gmp'])
 ]
 
 # Tuple of proto message definitions to build Python bindings for. Paths must